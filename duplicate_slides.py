@@ -0,0 +1,162 @@
+"""
+Detect duplicate WSIs (re-scanned or re-copied slides, e.g. "slide (2).mrxs") so that
+transfer, stats and tiling can skip redundant copies.
+
+Slides are first grouped by total size (the .mrxs file plus its data folder). Within a
+size group, each slide is fingerprinted by hashing only the head, tail and a few sampled
+blocks of every file. A full hash is only computed when fingerprints collide.
+Slides without a data folder or Slidedat.ini are excluded and reported as incomplete.
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import pandas as pd
+
+class DuplicateSlideFinder:
+    """Class to find duplicate slides and map every slide to a canonical copy."""
+    def __init__(self, slide_paths: list[str | Path], block_size: int = 1024 * 1024, n_samples: int = 4, max_workers: int = 8):
+        self.slide_paths = [Path(p) for p in slide_paths]
+        self.block_size = block_size
+        self.n_samples = n_samples
+        self.max_workers = max_workers
+
+    def _get_data_folder(self, slide_path: Path) -> Path:
+        """ Get the MRXS data folder next to the slide file, e.g. slide1.mrxs -> slide1/. """
+        return slide_path.with_suffix("")
+
+    def _is_complete(self, slide_path: Path) -> bool:
+        """ Return True if the slide has a data folder with a Slidedat.ini. """
+        return (self._get_data_folder(slide_path) / "Slidedat.ini").is_file()
+
+    def _get_incomplete_slides(self) -> list[Path]:
+        """ Slides without a data folder or Slidedat.ini. They are excluded from dedup and map to themselves. """
+        incomplete = [p for p in self.slide_paths if not self._is_complete(p)]
+        for slide_path in incomplete:
+            print(f"No data folder with Slidedat.ini for {slide_path}. Excluded from duplicate detection.")
+        return incomplete
+
+    def _get_slide_files(self, slide_path: Path) -> list[Path]:
+        """ Return the slide file followed by all files in its data folder, in a stable order. """
+        data_folder = self._get_data_folder(slide_path)
+        data_files = sorted(f for f in data_folder.rglob('*') if f.is_file()) if data_folder.is_dir() else []
+        return [slide_path] + data_files
+
+    def _relative_name(self, slide_path: Path, file: Path) -> str:
+        """ Name of a file relative to its slide, so copies with different names compare equal. """
+        if file == slide_path:
+            return ".mrxs"
+        return file.relative_to(self._get_data_folder(slide_path)).as_posix()
+
+    def _slide_size(self, slide_path: Path) -> int | None:
+        """ Total size in bytes of the slide file and its data folder. """
+        try:
+            return sum(f.stat().st_size for f in self._get_slide_files(slide_path))
+        except OSError as e:
+            print(f"Skipping {slide_path}: {e}")
+            return None
+
+    def _partial_file_hash(self, file: Path) -> str:
+        """ Hash the head, tail and a few evenly spaced blocks of a file. """
+        size = file.stat().st_size
+        hasher = hashlib.blake2b()
+        hasher.update(str(size).encode())
+        with open(file, 'rb') as f:
+            if size <= self.block_size * (self.n_samples + 2): # Small file, hash everything
+                hasher.update(f.read())
+                return hasher.hexdigest()
+            step = (size - self.block_size) // (self.n_samples + 1)
+            offsets = [0] + [step * i for i in range(1, self.n_samples + 1)] + [size - self.block_size]
+            for offset in offsets:
+                f.seek(offset)
+                hasher.update(f.read(self.block_size))
+        return hasher.hexdigest()
+
+    def _full_file_hash(self, file: Path) -> str:
+        """ Hash the entire content of a file. """
+        hasher = hashlib.blake2b()
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(self.block_size), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def _slide_hash(self, slide_path: Path, file_hash) -> str | None:
+        """ Combine the hashes of all files of a slide into one slide-level hash. """
+        hasher = hashlib.blake2b()
+        try:
+            for file in self._get_slide_files(slide_path):
+                hasher.update(self._relative_name(slide_path, file).encode())
+                hasher.update(file_hash(file).encode())
+        except OSError as e:
+            print(f"Skipping {slide_path}: {e}")
+            return None
+        return hasher.hexdigest()
+
+    def _compute_keys(self, slide_paths: list[Path], key_func) -> list:
+        """ Compute a key for each slide in a single worker pool. """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(key_func, slide_paths))
+
+    def _collisions(self, slide_paths: list[Path], keys: list) -> list[list[Path]]:
+        """ Group slides by key and return groups with more than one slide. Slides whose key contains None are dropped. """
+        groups = defaultdict(list)
+        for slide_path, key in zip(slide_paths, keys):
+            if None not in key:
+                groups[key].append(slide_path)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def _canonical(self, group: list[Path]) -> Path:
+        """ Pick the canonical slide: prefer names without a (number) suffix, then the shortest path. """
+        return min(group, key=lambda p: (re.search(r" \(\d+\)$", p.stem) is not None, len(str(p)), str(p)))
+
+    def find_duplicates(self) -> list[list[Path]]:
+        """ Return groups of slides with identical content. Incomplete slides are never grouped.
+        Each pass (size, partial hash, full hash) runs over all colliding slides in one worker pool.
+        """
+        slide_paths = [p for p in self.slide_paths if self._is_complete(p)]
+        sizes = self._compute_keys(slide_paths, self._slide_size)
+        keys = {p: (size,) for p, size in zip(slide_paths, sizes)}
+        candidates = [p for group in self._collisions(slide_paths, [keys[p] for p in slide_paths]) for p in group]
+
+        partial_hashes = self._compute_keys(candidates, lambda p: self._slide_hash(p, self._partial_file_hash))
+        for p, partial_hash in zip(candidates, partial_hashes):
+            keys[p] += (partial_hash,)
+        candidates = [p for group in self._collisions(candidates, [keys[p] for p in candidates]) for p in group]
+
+        full_hashes = self._compute_keys(candidates, lambda p: self._slide_hash(p, self._full_file_hash))
+        for p, full_hash in zip(candidates, full_hashes):
+            keys[p] += (full_hash,)
+        duplicates = self._collisions(candidates, [keys[p] for p in candidates])
+        print(f"Number of duplicate groups found: {len(duplicates)}")
+        return duplicates
+
+    def get_canonical_mapping(self) -> pd.DataFrame:
+        """ Map every slide to its canonical slide.
+        Slides without duplicates, and incomplete slides without a data folder, map to themselves.
+        """
+        incomplete = set(self._get_incomplete_slides())
+        canonical = {p: p for p in self.slide_paths}
+        for group in self.find_duplicates():
+            canonical_slide = self._canonical(group)
+            for slide_path in group:
+                canonical[slide_path] = canonical_slide
+        df = pd.DataFrame({
+            'filename': [str(p) for p in canonical],
+            'canonical': [str(p) for p in canonical.values()],
+        })
+        df['is_duplicate'] = df['filename'] != df['canonical']
+        df['incomplete'] = [p in incomplete for p in canonical]
+        return df
+
+if __name__ == "__main__":
+    # Example usage
+    base_directory = Path("path/to/slides")
+    slide_paths = sorted(base_directory.rglob("*.mrxs"))
+
+    finder = DuplicateSlideFinder(slide_paths)
+    df_canonical = finder.get_canonical_mapping()
+    print(f"Number of redundant copies: {df_canonical['is_duplicate'].sum()}")
+    print(f"Number of incomplete slides: {df_canonical['incomplete'].sum()}")
+    df_canonical.to_csv("path/to/canonical_slides.csv", index=False)
@@ -0,0 +1,219 @@
+"""
+Validate the integrity of MRXS slides before any expensive pipeline stage.
+
+For each slide, the data folder next to the .mrxs file (the one OpenSlide reads) must be
+among the matching folders found by FindWSIData. The Slidedat.ini in the data folder is
+parsed, and Index.dat is read to find how large every referenced .dat file must be to hold
+its tiles. Optionally, one stored tile per level is decoded. Slides are validated in
+parallel and the result is a per-slide status table.
+"""
+
+import configparser
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+import pandas as pd
+from file_errors import FindWSIData
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+INDEX_VERSION = "01.02"
+ZOOM_LEVEL_NAME = "Slide zoom level"
+
+class MRXSValidator:
+    """Class to validate MRXS slides found by FindWSIData."""
+    def __init__(self, finder: FindWSIData, decode_tiles: bool = False, max_workers: int = 8):
+        self.finder = finder
+        self.decode_tiles = decode_tiles
+        self.max_workers = max_workers
+        if self.decode_tiles and Image is None:
+            raise ImportError("Pillow is required to decode sample tiles.")
+
+    def _get_data_folder(self, wsi_path, folders) -> Path | None:
+        """ Return the data folder next to the slide file, if it is among the matching folders. """
+        data_folder = Path(wsi_path).with_suffix("").resolve()
+        if any(Path(folder).resolve() == data_folder for folder in folders or []):
+            return data_folder
+        return None
+
+    def _read_slidedat(self, data_folder: Path) -> configparser.ConfigParser:
+        """ Parse Slidedat.ini. The file may start with a BOM and contain duplicate keys. """
+        config = configparser.ConfigParser(strict=False, interpolation=None)
+        config.read(data_folder / "Slidedat.ini", encoding='utf-8-sig')
+        return config
+
+    def _get_data_files(self, config: configparser.ConfigParser) -> list[str]:
+        """ Get the data files referenced in Slidedat.ini, in file number order. """
+        if not config.has_section("DATAFILE"):
+            raise ValueError("Slidedat.ini has no [DATAFILE] section")
+        file_count = config.getint("DATAFILE", "FILE_COUNT")
+        return [config.get("DATAFILE", f"FILE_{i}") for i in range(file_count)]
+
+    def _get_zoom_levels(self, config: configparser.ConfigParser) -> tuple[int, int]:
+        """ Return the first hierarchical record index and the number of zoom levels. """
+        record = 0
+        for i in range(config.getint("HIERARCHICAL", "HIER_COUNT")):
+            count = config.getint("HIERARCHICAL", f"HIER_{i}_COUNT")
+            if config.get("HIERARCHICAL", f"HIER_{i}_NAME") == ZOOM_LEVEL_NAME:
+                return record, count
+            record += count
+        raise ValueError(f"Slidedat.ini has no '{ZOOM_LEVEL_NAME}' hierarchy")
+
+    def _read_int(self, f) -> int:
+        """ Read a little-endian 32-bit integer. """
+        return struct.unpack('<i', f.read(4))[0]
+
+    def _read_index(self, index_path: Path, config: configparser.ConfigParser) -> list[list[tuple[int, int, int]]]:
+        """ Read the tile records (offset, length, file number) of every zoom level from Index.dat. """
+        zoom_start, n_levels = self._get_zoom_levels(config)
+        slide_id = config.get("GENERAL", "SLIDE_ID")
+        levels = []
+        with open(index_path, 'rb') as f:
+            header = f.read(len(INDEX_VERSION) + len(slide_id)).decode('ascii', errors='replace')
+            if header != INDEX_VERSION + slide_id:
+                raise ValueError("Index.dat header does not match Slidedat.ini")
+            hier_root = self._read_int(f)
+            for level in range(n_levels):
+                f.seek(hier_root + 4 * (zoom_start + level))
+                f.seek(self._read_int(f))
+                if self._read_int(f) != 0:
+                    raise ValueError(f"Unexpected page list start for level {level}")
+                pointer = self._read_int(f)
+                records, visited = [], set()
+                while pointer and pointer not in visited: # Follow the linked list of pages
+                    visited.add(pointer)
+                    f.seek(pointer)
+                    page_len = self._read_int(f)
+                    pointer = self._read_int(f)
+                    for _ in range(page_len):
+                        _, offset, length, fileno = struct.unpack('<4i', f.read(16))
+                        records.append((offset, length, fileno))
+                levels.append(records)
+        return levels
+
+    def _check_index_records(self, levels: list[list[tuple[int, int, int]]], n_files: int) -> None:
+        """ Raise if a tile record points outside the data files in Slidedat.ini or has a negative offset or length. """
+        for level, records in enumerate(levels):
+            for offset, length, fileno in records:
+                if not 0 <= fileno < n_files:
+                    raise ValueError(f"Level {level}: tile record refers to file number {fileno}, but FILE_COUNT is {n_files}")
+                if offset < 0 or length < 0:
+                    raise ValueError(f"Level {level}: tile record has negative offset {offset} or length {length}")
+
+    def _get_required_sizes(self, levels: list[list[tuple[int, int, int]]]) -> dict[int, int]:
+        """ Minimum size of each data file: the largest offset + length of its tiles. """
+        required = {}
+        for records in levels:
+            for offset, length, fileno in records:
+                required[fileno] = max(required.get(fileno, 0), offset + length)
+        return required
+
+    def _check_files(self, data_folder: Path, files: list[str], required: dict[int, int]) -> tuple[list[str], list[str]]:
+        """ Return data files that are missing and files that are too small to hold their tiles. """
+        missing, truncated = [], []
+        for fileno, file in enumerate(files):
+            path = data_folder / file
+            if not path.is_file():
+                missing.append(file)
+            elif path.stat().st_size < required.get(fileno, 1):
+                truncated.append(file)
+        return missing, truncated
+
+    def _decode_sample_tiles(self, data_folder: Path, files: list[str], levels: list[list[tuple[int, int, int]]]) -> None:
+        """ Decode the stored tile furthest into its data file for every level. Raises if a tile cannot be decoded. """
+        for level, records in enumerate(levels):
+            if not records:
+                continue
+            offset, length, fileno = max(records, key=lambda r: r[0] + r[1])
+            with open(data_folder / files[fileno], 'rb') as f:
+                f.seek(offset)
+                data = f.read(length)
+            try:
+                with Image.open(BytesIO(data)) as tile:
+                    tile.load()
+            except (OSError, SyntaxError, ValueError) as e: # Pillow raises several error types for corrupt data
+                raise ValueError(f"Level {level}: {e}") from e
+
+    def _validate_slide(self, wsi_path, folders) -> dict:
+        """ Validate a single slide and return its status row. """
+        result = {'filename': wsi_path, 'status': 'ok', 'data_folder': None, 'n_files': 0,
+                  'missing_files': [], 'truncated_files': [], 'error': None}
+        data_folder = self._get_data_folder(wsi_path, folders)
+        if data_folder is None:
+            result['status'] = 'no_data_folder'
+            return result
+        result['data_folder'] = str(data_folder)
+        if not (data_folder / "Slidedat.ini").is_file():
+            result['status'] = 'no_slidedat'
+            return result
+        try:
+            config = self._read_slidedat(data_folder)
+            files = self._get_data_files(config)
+            index_file = config.get("HIERARCHICAL", "INDEXFILE")
+        except (configparser.Error, ValueError) as e:
+            result['status'] = 'invalid_slidedat'
+            result['error'] = str(e)
+            return result
+        result['n_files'] = len(files) + 1
+        if not (data_folder / index_file).is_file():
+            result['status'] = 'missing_files'
+            result['missing_files'] = [index_file]
+            return result
+        try:
+            levels = self._read_index(data_folder / index_file, config)
+            self._check_index_records(levels, len(files))
+        except (configparser.Error, ValueError, struct.error) as e:
+            result['status'] = 'invalid_index'
+            result['error'] = str(e)
+            return result
+        result['missing_files'], result['truncated_files'] = self._check_files(data_folder, files, self._get_required_sizes(levels))
+        if result['missing_files']:
+            result['status'] = 'missing_files'
+        elif result['truncated_files']:
+            result['status'] = 'truncated_files'
+        elif self.decode_tiles:
+            try:
+                self._decode_sample_tiles(data_folder, files, levels)
+            except ValueError as e:
+                result['status'] = 'decode_error'
+                result['error'] = str(e)
+        return result
+
+    def _validate_slide_safe(self, wsi_path, folders) -> dict:
+        """ Validate a single slide, recording I/O errors (e.g. network drops) and unexpected errors instead of raising. """
+        try:
+            return self._validate_slide(wsi_path, folders)
+        except OSError as e:
+            status, error = 'io_error', str(e)
+        except Exception as e: # Never let one slide stop the whole run
+            status, error = 'error', f"{type(e).__name__}: {e}"
+        return {'filename': wsi_path, 'status': status, 'data_folder': None, 'n_files': 0,
+                'missing_files': [], 'truncated_files': [], 'error': error}
+
+    def validate(self) -> pd.DataFrame:
+        """ Validate all slides in parallel and return a per-slide status table. """
+        df = self.finder.df_results
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._validate_slide_safe, df[self.finder.col], df['matching_folders']))
+        df_status = pd.DataFrame(results)
+        print(df_status['status'].value_counts())
+        return df_status
+
+if __name__ == "__main__":
+    # Example usage
+    df_wsi = pd.read_csv("path/to/wsi_stats.csv", index_col=0)
+    df_wsi = df_wsi.reset_index()  # filename becomes a column
+
+    base_directory = Path(r"//regsj/.intern/appl/Deep_Visual_Proteomics")
+    finder = FindWSIData(base_directory, df = df_wsi, col = 'filename')
+    validator = MRXSValidator(finder, decode_tiles = True)
+    df_status = validator.validate()
+    df_status.to_csv("path/to/slide_status.csv", index=False)
+
+    # Only pass valid slides to the next pipeline stage
+    valid_slides = df_status.loc[df_status['status'] == 'ok', 'filename'].tolist()
+    print(f"Number of valid slides: {len(valid_slides)}")